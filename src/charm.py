@@ -4,6 +4,7 @@
 
 """NFS client charmed operator for mounting NFS shares."""
 
+import copy
 import logging
 
 from charms.storage_libs.v0.nfs_interfaces import (
@@ -21,6 +22,23 @@ import utils.manager as nfs
 
 logger = logging.getLogger(__name__)
 
+# Config option, mount option if enabled, mount option if disabled.
+_OPT_MAP = (
+    ("noexec", "noexec", "exec"),
+    ("nosuid", "nosuid", "suid"),
+    ("nodev", "nodev", "dev"),
+    ("read-only", "ro", "rw"),
+)
+
+# Default values of the charm's stored state.
+_STORED_DEFAULTS = {
+    "mountpoint": None,
+    "size": None,
+    "autofs_id": None,
+    "config": None,
+    "mntopts": {"noexec": None, "nosuid": None, "nodev": None, "read-only": None},
+}
+
 
 class NFSClientCharm(CharmBase):
     """NFS client charmed operator."""
@@ -29,11 +47,7 @@ class NFSClientCharm(CharmBase):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
-        self._stored.set_default(
-            mountpoint=None,
-            size=None,
-            mntopts={"noexec": None, "nosuid": None, "nodev": None, "read-only": None},
-        )
+        self._stored.set_default(**copy.deepcopy(_STORED_DEFAULTS))
         self._nfs_share = NFSRequires(self, "nfs-share")
         self.framework.observe(self.on.install, self._on_install)
         self.framework.observe(self.on.config_changed, self._on_config_changed)
@@ -53,9 +67,26 @@ class NFSClientCharm(CharmBase):
             nfs.install()
         except nfs.Error as e:
             self.unit.status = BlockedStatus(e.message)
+            return
+
+        # An unchanged configuration will not reset the status after a `juju refresh`.
+        if self.config.get("mountpoint") is None:
+            self.unit.status = BlockedStatus("No configured mountpoint")
+        elif (mountpoint := self._stored.mountpoint) and nfs.mounted(mountpoint):
+            self.unit.status = ActiveStatus(f"NFS share mounted at {mountpoint}")
+        else:
+            self.unit.status = WaitingStatus("Waiting for NFS share")
 
     def _on_config_changed(self, _) -> None:
         """Handle updates to NFS client configuration."""
+        # Store the values rather than a hash since `hash` is salted per process.
+        opts = ("mountpoint", "size", *(opt for opt, _, _ in _OPT_MAP))
+        config = [self.config.get(opt) for opt in opts]
+        if config == self._stored.config:
+            logger.debug("Configuration has not changed. Skipping")
+            return
+        self._stored.config = config
+
         mountpoint = self.config.get("mountpoint")
         if mountpoint is None:
             self.unit.status = BlockedStatus("No configured mountpoint")
@@ -64,6 +95,8 @@ class NFSClientCharm(CharmBase):
         if self._stored.mountpoint is None:
             logger.debug(f"Setting mountpoint as {mountpoint}")
             self._stored.mountpoint = mountpoint
+            # Resolve the autofs id once rather than on every mount and umount.
+            self._stored.autofs_id = nfs.mountpoint_to_autofs_id(mountpoint)
         elif self._stored.mountpoint is not None:
             self.unit.status = WaitingStatus("Already set")
             logger.warning(f"Mountpoint can only be set once. Ignoring {mountpoint}")
@@ -86,12 +119,15 @@ class NFSClientCharm(CharmBase):
 
     def _on_stop(self, _) -> None:
         """Clean up machine before de-provisioning."""
-        if nfs.mounted(mountpoint := self.config.get("mountpoint")):
+        snapshot = nfs.snapshot()
+        if nfs.mounted(mountpoint := self.config.get("mountpoint"), snapshot):
             self.unit.status = MaintenanceStatus(f"Unmounting {mountpoint}")
             nfs.umount(mountpoint)
+            # The share can stay mounted if it is busy, so the table must be read again.
+            snapshot = nfs.snapshot()
 
         # Only remove the required packages if there are no existing NFS shares outside of charm.
-        if not nfs.mounts():
+        if not snapshot:
             self.unit.status = MaintenanceStatus("Removing required packages")
             nfs.remove()
 
@@ -115,15 +151,15 @@ class NFSClientCharm(CharmBase):
 
     def _on_mount_share(self, event: MountShareEvent) -> None:
         """Mount an NFS share."""
+        mountpoint = self._stored.mountpoint
+        mntopts = dict(self._stored.mntopts)
         try:
             if not nfs.mounted(event.endpoint):
-                opts = []
-                opts.append("noexec") if self._stored.mntopts["noexec"] else opts.append("exec")
-                opts.append("nosuid") if self._stored.mntopts["nosuid"] else opts.append("suid")
-                opts.append("nodev") if self._stored.mntopts["nodev"] else opts.append("dev")
-                opts.append("ro") if self._stored.mntopts["read-only"] else opts.append("rw")
-                nfs.mount(event.endpoint, self._stored.mountpoint, options=opts)
-                self.unit.status = ActiveStatus(f"NFS share mounted at {self._stored.mountpoint}")
+                opts = [on if mntopts[opt] else off for opt, on, off in _OPT_MAP]
+                nfs.mount(
+                    event.endpoint, mountpoint, options=opts, autofs_id=self._stored.autofs_id
+                )
+                self.unit.status = ActiveStatus(f"NFS share mounted at {mountpoint}")
             else:
                 logger.warning(f"Endpoint {event.endpoint} already mounted")
         except nfs.Error as e:
@@ -141,7 +177,7 @@ class NFSClientCharm(CharmBase):
             else:
                 logger.warning(f"No endpoint provided, defaulting to {self._stored.mountpoint}")
                 if nfs.mounted(self._stored.mountpoint):
-                    nfs.umount(self._stored.mountpoint)
+                    nfs.umount(self._stored.mountpoint, autofs_id=self._stored.autofs_id)
                 else:
                     logger.warning(f"{self._stored.mountpoint} is not mounted")
 
@@ -151,38 +187,34 @@ class NFSClientCharm(CharmBase):
 
     def _on_force_umount_action(self, event: ActionEvent) -> None:
         """Handle `force-umount` action."""
-        if (
-            nfs.mounted(self._stored.mountpoint)
-            and self._stored.mountpoint == event.params["mountpoint"]
-        ):
-            self.unit.status = MaintenanceStatus(
-                f"Forcefully unmounting NFS share at {self._stored.mountpoint}"
+        mountpoint = self._stored.mountpoint
+        target = event.params["mountpoint"]
+        if mountpoint != target:
+            logger.debug(
+                message := f"Mountpoint {mountpoint} does not equal specified mountpoint {target}"
             )
-            try:
-                logger.warning(
-                    (
-                        f"Forcefully unmounting {self._stored.mountpoint}. "
-                        "A forced umount can potentially cause data corruption"
-                    )
-                )
-                nfs.umount(self._stored.mountpoint)
-                self.unit.status = WaitingStatus("Waiting for NFS share")
-                event.set_results({"result": "Forced umount successful"})
-            except nfs.Error as e:
-                self.unit.status = BlockedStatus(e.message)
-                event.fail(e.message)
-        else:
-            if self._stored.mountpoint != event.params["mountpoint"]:
-                logger.debug(
-                    message := (
-                        f"Mountpoint {self._stored.mountpoint} does not equal "
-                        f"specified mountpoint {event.params['mountpoint']}"
-                    )
+            event.fail(message)
+            return
+
+        if not nfs.mounted(mountpoint):
+            logger.debug(message := f"{mountpoint} is not mounted")
+            event.fail(message)
+            return
+
+        self.unit.status = MaintenanceStatus(f"Forcefully unmounting NFS share at {mountpoint}")
+        try:
+            logger.warning(
+                (
+                    f"Forcefully unmounting {mountpoint}. "
+                    "A forced umount can potentially cause data corruption"
                 )
-                event.fail(message)
-            else:
-                logger.debug(message := f"{self._stored.mountpoint} is not mounted")
-                event.fail(message)
+            )
+            nfs.umount(mountpoint, autofs_id=self._stored.autofs_id)
+            self.unit.status = WaitingStatus("Waiting for NFS share")
+            event.set_results({"result": "Forced umount successful"})
+        except nfs.Error as e:
+            self.unit.status = BlockedStatus(e.message)
+            event.fail(e.message)
 
 
 if __name__ == "__main__":  # pragma: nocover
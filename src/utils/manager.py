@@ -3,20 +3,21 @@
 
 """Manage machine NFS mounts and dependencies."""
 
+import functools
 import logging
 import os
 import pathlib
-import shutil
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from ipaddress import AddressValueError, IPv6Address
-from typing import Iterator, List, Optional, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlsplit
 
-import charms.operator_libs_linux.v0.apt as apt
-import charms.operator_libs_linux.v1.systemd as systemd
-
 _logger = logging.getLogger(__name__)
+_APT_UPDATE_STAMP = "/var/lib/apt/periodic/update-success-stamp"
+_APT_CACHE_MAX_AGE = 3600
 
 
 class Error(Exception):
@@ -53,6 +54,49 @@ class MountInfo:
     passno: str
 
 
+class MountTable:
+    """Point-in-time view of the NFS mounts on a machine.
+
+    Notes:
+        Mounts are indexed by both endpoint and mountpoint so that
+        lookups do not need to re-read `/proc/mounts`.
+    """
+
+    def __init__(self, mounts: Iterable[MountInfo]) -> None:
+        self._mounts = list(mounts)
+        self._index: Dict[str, MountInfo] = {}
+        for mount in self._mounts:
+            # Keep the first match to mirror the lookup order of `fetch`.
+            self._index.setdefault(mount.mountpoint, mount)
+            self._index.setdefault(mount.endpoint, mount)
+
+    def __contains__(self, target: str) -> bool:
+        """Check if NFS mountpoint or endpoint is in the mount table."""
+        return self.get(target) is not None
+
+    def __iter__(self) -> Iterator[MountInfo]:
+        """Iterate over all NFS mounts in the mount table."""
+        return iter(self._mounts)
+
+    def __len__(self) -> int:
+        """Get the number of NFS mounts in the mount table."""
+        return len(self._mounts)
+
+    def get(self, target: str) -> Optional[MountInfo]:
+        """Get information about an NFS mount.
+
+        Args:
+            target: NFS share endpoint or mountpoint information to get.
+
+        Returns:
+            Optional[MountInfo]: Mount information. None if NFS share is not mounted.
+        """
+        if endpoint := _translate(target):
+            target, _port = endpoint
+
+        return self._index.get(target)
+
+
 def _translate(url: str) -> Optional[Tuple[str, Optional[int]]]:
     """Translate an NFS URL to a mount.nfs endpoint.
 
@@ -62,6 +106,10 @@ def _translate(url: str) -> Optional[Tuple[str, Optional[int]]]:
     Returns:
         `mount.nfs`-understandable endpoint and port number. `None` if the NFS URL is invalid.
     """
+    # Skip URL parsing for targets that cannot be NFS URLs, such as mountpoints.
+    if not url or url[:6].lower() != "nfs://":
+        return
+
     _logger.debug(f"Translating NFS URL {url} to `mount.nfs` format")
 
     try:
@@ -83,8 +131,13 @@ def _translate(url: str) -> Optional[Tuple[str, Optional[int]]]:
         return f"{host}:{nfs_url.path}", port
 
 
+@functools.lru_cache(maxsize=1)
 def supported() -> bool:
-    """Check if underlying base supports mounting NFS shares."""
+    """Check if underlying base supports mounting NFS shares.
+
+    Notes:
+        The result is cached since virtualization does not change during the charm's lifetime.
+    """
     try:
         result = subprocess.run(
             ["systemd-detect-virt"], stdout=subprocess.PIPE, check=True, text=True
@@ -105,9 +158,12 @@ def install() -> None:
     Raises:
         Error: Raised if this failed to install any of the required packages.
     """
+    import charms.operator_libs_linux.v0.apt as apt
+
     _logger.debug("Installing required packages from apt archive.")
     try:
-        apt.add_package(["nfs-common", "autofs"], update_cache=True)
+        # `add_package` still refreshes the apt cache if a package cannot be found.
+        apt.add_package(["nfs-common", "autofs"], update_cache=_apt_cache_stale())
     except (apt.PackageError, apt.PackageNotFoundError) as e:
         _logger.error(f"Failed to install required packages. Reason:\n{e.message}")
         raise Error(e.message)
@@ -119,6 +175,8 @@ def remove() -> None:
     Raises
         Error: Raised if a required package was installed but could not be removed.
     """
+    import charms.operator_libs_linux.v0.apt as apt
+
     _logger.debug("Removing required packages from system packages")
     try:
         apt.remove_package(["nfs-common", "autofs"])
@@ -129,26 +187,31 @@ def remove() -> None:
         raise Error("Failed to remove required packages")
 
 
-def fetch(target: str) -> Optional[MountInfo]:
+def fetch(target: str, snapshot: Optional[MountTable] = None) -> Optional[MountInfo]:
     """Fetch information about an NFS mount.
 
     Args:
         target: NFS share endpoint or mountpoint information to fetch.
+        snapshot: Mount table to look up `target` in. Reads `/proc/mounts` if not provided.
 
     Returns:
         Optional[MountInfo]: Mount information. None if NFS share is not mounted.
     """
+    if snapshot is not None:
+        return snapshot.get(target)
+
     # Translate to `mount.nfs` endpoint format, since that is what is stored in /proc/mounts.
+    # We need to trigger an automount for the mounts that are of type `autofs`,
+    # since those could contain a `nfs` or `nfs4` mount. A mountpoint can only be
+    # provided by the autofs mount at the same path, so unrelated ones are skipped.
+    # Endpoints can be provided by any autofs mount, so all of them are triggered.
     if endpoint := _translate(target):
         target, _port = endpoint
+    _trigger_autofs(target if target and target.startswith("/") else None)
 
-    # We need to trigger an automount for the mounts that are of type `autofs`,
-    # since those could contain a `nfs` or `nfs4` mount.
-    _trigger_autofs()
-
-    for mount in _mounts("nfs"):
-        if mount.mountpoint == target or mount.endpoint == target:
-            return mount
+    for fields in _mount_fields("nfs"):
+        if fields[1] == target or fields[0] == target:
+            return MountInfo(*fields)
 
     return None
 
@@ -164,17 +227,37 @@ def mounts() -> List[MountInfo]:
     return list(_mounts("nfs"))
 
 
-def mounted(target: str) -> bool:
+def snapshot() -> MountTable:
+    """Take a snapshot of all NFS mounts on a machine.
+
+    Returns:
+        MountTable: All current NFS mounts on machine, indexed by endpoint and mountpoint.
+    """
+    _trigger_autofs()
+
+    return MountTable(_mounts("nfs"))
+
+
+def mounted(target: str, snapshot: Optional[MountTable] = None) -> bool:
     """Determine if NFS mountpoint or endpoint is mounted.
 
     Args:
         target: NFS share endpoint or mountpoint to check.
+        snapshot: Mount table to look up `target` in. Reads `/proc/mounts` if not provided.
     """
-    return fetch(target) is not None
+    # A path that is not a mountpoint cannot be an NFS mount. Checking that only needs
+    # a couple of `lstat` calls rather than triggering autofs and reading /proc/mounts.
+    if snapshot is None and target and target.startswith("/") and not os.path.ismount(target):
+        return False
+
+    return fetch(target, snapshot) is not None
 
 
 def mount(
-    endpoint: str, mountpoint: Union[str, os.PathLike], options: Optional[List[str]] = None
+    endpoint: str,
+    mountpoint: Union[str, os.PathLike],
+    options: Optional[List[str]] = None,
+    autofs_id: Optional[str] = None,
 ) -> None:
     """Mount an NFS share.
 
@@ -182,58 +265,47 @@ def mount(
         endpoint: NFS share endpoint to mount.
         mountpoint: System location to mount NFS share endpoint.
         options: Mount options to pass when mounting NFS share.
+        autofs_id: autofs id of `mountpoint`. Derived from `mountpoint` if not provided.
 
     Raises:
         Error: Raised if the mount operation fails.
     """
-    # Translate `endpoint` to the `mount.nfs` format if `endpoint` is an NFS URL.
-    # The relation provider must ensure the endpoint is a valid NFS URL.
-    if tl := _translate(endpoint):
-        endpoint, port = tl
-    else:
-        _logger.error(f"Cannot translate invalid endpoint url {endpoint}")
-        raise Error(f"Cannot translate invalid endpoint url {endpoint}")
+    _reload_automounts([_configure_automount(endpoint, mountpoint, options, autofs_id)])
 
-    # Try to create the mountpoint without checking if it exists to avoid TOCTOU.
-    target = pathlib.Path(mountpoint)
-    try:
-        target.mkdir()
-        _logger.debug(f"Created mountpoint {mountpoint}.")
-    except FileExistsError:
-        _logger.warning(f"Mountpoint {mountpoint} already exists.")
 
-    mount_opts = ""
-    if options:
-        if port:
-            options.append(f"port={port}")
-        mount_opts = ",".join(options)
+def mount_many(shares: List[Tuple[str, Union[str, os.PathLike], Optional[List[str]]]]) -> None:
+    """Mount multiple NFS shares with a single autofs reload.
 
-    _logger.debug(f"Mounting NFS share endpoint {endpoint} at {target} with options {options}")
-    autofs_id = _mountpoint_to_autofs_id(target)
-    master = f"/- /etc/auto.{autofs_id}" + (f" {mount_opts}" if mount_opts else "")
-    pathlib.Path(f"/etc/auto.master.d/{autofs_id}.autofs").write_text(master)
-    pathlib.Path(f"/etc/auto.{autofs_id}").write_text(f"{target} {endpoint}")
+    Args:
+        shares: NFS share endpoint, mountpoint, and mount options for each share to mount.
 
-    try:
-        systemd.service_reload("autofs", restart_on_failure=True)
-    except systemd.SystemdError as e:
-        _logger.error(f"Failed to mount {endpoint} at {target}. Reason:\n{e}")
-        if "Operation not permitted" in str(e) and not supported():
-            raise Error("Mounting NFS shares not supported on LXD containers")
-        raise Error(f"Failed to mount {endpoint} at {target}")
+    Raises:
+        Error: Raised if the mount operation fails.
+    """
+    # Validate every endpoint first so an invalid share does not leave the others half configured.
+    for endpoint, _, _ in shares:
+        if not _translate(endpoint):
+            _logger.error(f"Cannot translate invalid endpoint url {endpoint}")
+            raise Error(f"Cannot translate invalid endpoint url {endpoint}")
+
+    _reload_automounts([_configure_automount(*share) for share in shares])
 
 
-def umount(mountpoint: Union[str, os.PathLike]) -> None:
+def umount(mountpoint: Union[str, os.PathLike], autofs_id: Optional[str] = None) -> None:
     """Unmount an NFS share.
 
     Args:
         mountpoint: NFS share mountpoint to unmount.
+        autofs_id: autofs id of `mountpoint`. Derived from `mountpoint` if not provided.
 
     Raises:
         Error: Raised if NFS share umount operation fails.
     """
+    import charms.operator_libs_linux.v1.systemd as systemd
+
     _logger.debug(f"Unmounting NFS share at mountpoint {mountpoint}")
-    autofs_id = _mountpoint_to_autofs_id(mountpoint)
+    if autofs_id is None:
+        autofs_id = mountpoint_to_autofs_id(mountpoint)
     pathlib.Path(f"/etc/auto.{autofs_id}").unlink(missing_ok=True)
     pathlib.Path(f"/etc/auto.master.d/{autofs_id}.autofs").unlink(missing_ok=True)
 
@@ -243,33 +315,158 @@ def umount(mountpoint: Union[str, os.PathLike]) -> None:
         _logger.error(f"Failed to unmount {mountpoint}. Reason:\n{e}")
         raise Error(f"Failed to unmount {mountpoint}")
 
-    shutil.rmtree(mountpoint, ignore_errors=True)
+    # Only remove an empty mountpoint so data shadowed by the mount is not deleted.
+    try:
+        os.rmdir(mountpoint)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        _logger.warning(f"Not removing mountpoint {mountpoint}. Reason:\n{e}")
+
+
+def mountpoint_to_autofs_id(mountpoint: Union[str, os.PathLike]) -> str:
+    """Get the autofs id of a mountpoint path.
+
+    Args:
+        mountpoint: NFS share mountpoint.
+    """
+    path = pathlib.Path(mountpoint).resolve()
+    return str(path).lstrip("/").replace("/", "-")
 
 
-def _trigger_autofs() -> None:
+def _apt_cache_stale() -> bool:
+    """Check if the apt cache has not been successfully updated recently."""
+    try:
+        updated = os.stat(_APT_UPDATE_STAMP).st_mtime
+    except OSError:
+        return True
+
+    return time.time() - updated > _APT_CACHE_MAX_AGE
+
+
+def _trigger_autofs(target: Optional[str] = None) -> None:
     """Triggers a mount on all filesystems handled by autofs.
 
     This function is useful to make autofs-managed mounts appear on the
     `/proc/mount` file, since they could be unmounted when reading the file.
+
+    Args:
+        target: Only trigger the autofs mount at this mountpoint. Triggers all if not provided.
     """
-    for fs in _mounts("autofs"):
-        _logger.info(f"triggering automount for `{fs.mountpoint}`")
-        try:
-            os.scandir(fs.mountpoint).close()
-        except OSError as e:
-            # Not critical since it could also be caused by unrelated mounts,
-            # but should be good to log it in case this causes problems.
-            _logger.warning(f"Could not trigger automount for `{fs.mountpoint}`. Reason:\n{e}")
+    mountpoints = [
+        fs.mountpoint for fs in _mounts("autofs") if target is None or fs.mountpoint == target
+    ]
+    if len(mountpoints) <= 1:
+        for mountpoint in mountpoints:
+            _automount(mountpoint)
+        return
 
+    # Each automount can block on the network, so trigger them concurrently.
+    with ThreadPoolExecutor(max_workers=min(32, len(mountpoints))) as executor:
+        # Consume the results so errors raised by `_automount` are not silently dropped.
+        list(executor.map(_automount, mountpoints))
 
-def _mountpoint_to_autofs_id(mountpoint: Union[str, os.PathLike]) -> str:
-    """Get the autofs id of a mountpoint path.
+
+def _automount(mountpoint: str) -> None:
+    """Trigger a mount on a filesystem handled by autofs.
 
     Args:
-        mountpoint: NFS share mountpoint.
+        mountpoint: autofs mountpoint to trigger.
     """
-    path = pathlib.Path(mountpoint).resolve()
-    return str(path).lstrip("/").replace("/", "-")
+    _logger.info(f"triggering automount for `{mountpoint}`")
+    try:
+        os.scandir(mountpoint).close()
+    except OSError as e:
+        # Not critical since it could also be caused by unrelated mounts,
+        # but should be good to log it in case this causes problems.
+        _logger.warning(f"Could not trigger automount for `{mountpoint}`. Reason:\n{e}")
+
+
+def _reload_automounts(configured: List[Tuple[str, pathlib.Path]]) -> None:
+    """Reload autofs to apply newly configured NFS shares.
+
+    Args:
+        configured: `mount.nfs`-understandable endpoint and mountpoint of each configured share.
+
+    Raises:
+        Error: Raised if autofs fails to reload.
+    """
+    import charms.operator_libs_linux.v1.systemd as systemd
+
+    try:
+        systemd.service_reload("autofs", restart_on_failure=True)
+    except systemd.SystemdError as e:
+        desc = ", ".join(f"{endpoint} at {target}" for endpoint, target in configured)
+        _logger.error(f"Failed to mount {desc}. Reason:\n{e}")
+        if "Operation not permitted" in str(e) and not supported():
+            raise Error("Mounting NFS shares not supported on LXD containers")
+        raise Error(f"Failed to mount {desc}")
+
+
+def _configure_automount(
+    endpoint: str,
+    mountpoint: Union[str, os.PathLike],
+    options: Optional[List[str]] = None,
+    autofs_id: Optional[str] = None,
+) -> Tuple[str, pathlib.Path]:
+    """Write the autofs master and map files for an NFS share.
+
+    Args:
+        endpoint: NFS share endpoint to mount.
+        mountpoint: System location to mount NFS share endpoint.
+        options: Mount options to pass when mounting NFS share.
+        autofs_id: autofs id of `mountpoint`. Derived from `mountpoint` if not provided.
+
+    Returns:
+        `mount.nfs`-understandable endpoint and mountpoint of the configured NFS share.
+
+    Raises:
+        Error: Raised if the endpoint is not a valid NFS URL.
+    """
+    # Translate `endpoint` to the `mount.nfs` format if `endpoint` is an NFS URL.
+    # The relation provider must ensure the endpoint is a valid NFS URL.
+    if tl := _translate(endpoint):
+        endpoint, port = tl
+    else:
+        _logger.error(f"Cannot translate invalid endpoint url {endpoint}")
+        raise Error(f"Cannot translate invalid endpoint url {endpoint}")
+
+    # Try to create the mountpoint without checking if it exists to avoid TOCTOU.
+    target = pathlib.Path(mountpoint)
+    try:
+        target.mkdir()
+        _logger.debug(f"Created mountpoint {mountpoint}.")
+    except FileExistsError:
+        _logger.warning(f"Mountpoint {mountpoint} already exists.")
+
+    mount_opts = ""
+    if options:
+        if port:
+            options.append(f"port={port}")
+        mount_opts = ",".join(options)
+
+    _logger.debug(f"Mounting NFS share endpoint {endpoint} at {target} with options {options}")
+    if autofs_id is None:
+        autofs_id = mountpoint_to_autofs_id(target)
+    master = f"/- /etc/auto.{autofs_id}" + (f" {mount_opts}" if mount_opts else "")
+    _write_file(f"/etc/auto.master.d/{autofs_id}.autofs", master)
+    _write_file(f"/etc/auto.{autofs_id}", f"{target} {endpoint}")
+
+    return endpoint, target
+
+
+def _write_file(path: Union[str, os.PathLike], payload: str) -> None:
+    """Write a small payload to a file without going through a buffered text stream.
+
+    Args:
+        path: File to create or truncate.
+        payload: Contents of the file.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, payload.encode())
+    finally:
+        os.close(fd)
 
 
 def _mounts(fstype: str) -> Iterator[MountInfo]:
@@ -278,12 +475,28 @@ def _mounts(fstype: str) -> Iterator[MountInfo]:
     Returns:
         Iterator[MountInfo]: All the mounts with a valid fstype.
     """
-    with pathlib.Path("/proc/mounts").open("rt") as mounts:
-        for mount in mounts:
-            # Lines in /proc/mounts follow the standard format
-            # <endpoint> <mountpoint> <fstype> <options> <freq> <passno>
-            m = MountInfo(*mount.split())
-            if not m.fstype.startswith(fstype):
-                continue
-
-            yield m
+    for fields in _mount_fields(fstype):
+        yield MountInfo(*fields)
+
+
+def _mount_fields(fstype: str) -> Iterator[List[str]]:
+    """Gets an iterator of the raw fields of all mounts that have the requested fstype.
+
+    Returns:
+        Iterator[List[str]]: Fields of all the mounts with a valid fstype.
+    """
+    with pathlib.Path("/proc/mounts").open("rb") as mounts:
+        data = mounts.read()
+
+    # Whitespace in /proc/mounts fields is octal-escaped, so " <fstype>" can only
+    # match a field boundary. This rejects most lines without decoding them.
+    prefilter = f" {fstype}".encode()
+    for mount in data.splitlines():
+        if prefilter not in mount:
+            continue
+
+        # Lines in /proc/mounts follow the standard format
+        # <endpoint> <mountpoint> <fstype> <options> <freq> <passno>
+        fields = os.fsdecode(mount).split()
+        if fields[2].startswith(fstype):
+            yield fields
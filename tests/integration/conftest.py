@@ -11,6 +11,17 @@ import pytest
 from _pytest.config.argparsing import Parser
 from pytest_operator.plugin import OpsTest
 
+_CHARM_CACHE_KEY = "nfs_client/charm"
+_CHARM_SOURCES = [
+    "src",
+    "lib",
+    "requirements.txt",
+    "charmcraft.yaml",
+    "metadata.yaml",
+    "config.yaml",
+    "actions.yaml",
+]
+
 
 def pytest_addoption(parser: Parser) -> None:
     parser.addoption(
@@ -31,8 +42,32 @@ def use_ipv6(request) -> bool:
     return request.config.getoption("--ipv6")
 
 
+def _source_mtime() -> float:
+    """Get the latest modification time of the files that make up the nfs-client charm."""
+    paths = [pathlib.Path(p) for p in _CHARM_SOURCES]
+    files = [
+        f
+        for p in paths
+        for f in ([p] if p.is_file() else p.rglob("*"))
+        # Bytecode is rewritten by the unit tests, so it must not invalidate the cached charm.
+        if f.is_file() and "__pycache__" not in f.parts and f.suffix != ".pyc"
+    ]
+    return max(f.stat().st_mtime for f in files)
+
+
 @pytest.fixture(scope="module")
 async def nfs_client_charm(ops_test: OpsTest, request) -> Coroutine[Any, Any, pathlib.Path]:
-    """Build nfs-client charm to use for integration tests."""
+    """Build nfs-client charm to use for integration tests.
+
+    Notes:
+        The built charm is recorded in the pytest cache and reused by later test
+        modules and runs until any of the charm sources are modified.
+    """
+    mtime = _source_mtime()
+    cached = request.config.cache.get(_CHARM_CACHE_KEY, None)
+    if cached and cached["mtime"] == mtime and pathlib.Path(cached["path"]).exists():
+        return pathlib.Path(cached["path"])
+
     charm = await ops_test.build_charm(".")
+    request.config.cache.set(_CHARM_CACHE_KEY, {"path": str(charm), "mtime": mtime})
     return charm
@@ -4,15 +4,19 @@
 """Helpers for nfs-client integration tests."""
 
 import logging
+import os
 import textwrap
 
-from pylxd import Client
+import tenacity
 
 _logger = logging.getLogger(__name__)
+_NFS_SERVER_IMAGE = "nfs-server-ready"
 
 
 def modify_lxd_config(use_ipv6: bool) -> None:
     """Modify the LXD config."""
+    from pylxd import Client
+
     client = Client()
     config = {
         "security.privileged": "true",
@@ -36,23 +40,22 @@ def modify_lxd_config(use_ipv6: bool) -> None:
 def bootstrap_nfs_server(use_ipv6: bool) -> str:
     """Bootstrap a minimal NFS kernel server in LXD.
 
+    Notes:
+        Set `NFS_CACHE_LXD_IMAGE=1` to publish the configured server as a local LXD
+        image and bootstrap later servers from it instead of installing from apt.
+
     Returns:
         str: NFS URL endpoint.
     """
+    from pylxd import Client
+
     client = Client()
 
     if client.instances.exists("nfs-server"):
         _logger.info("NFS server already exists")
-        instance = client.instances.get("nfs-server")
-        address = instance.state().network["eth0"]["addresses"][int(use_ipv6)]["address"]
-        if use_ipv6:
-            endpoint = f"nfs://[{address}]/data"
-        else:
-            endpoint = f"nfs://{address}/data"
-        _logger.info(f"NFS share endpoint is {endpoint}")
-        return endpoint
+        return _nfs_endpoint(client.instances.get("nfs-server"), use_ipv6)
 
-    _logger.info("Bootstrapping minimal NFS kernel server")
+    cache_image = os.environ.get("NFS_CACHE_LXD_IMAGE") == "1"
     config = {
         "name": "nfs-server",
         "source": {
@@ -64,18 +67,25 @@ def bootstrap_nfs_server(use_ipv6: bool) -> str:
         },
         "type": "container",
     }
+    if cache_image and client.images.exists(_NFS_SERVER_IMAGE, alias=True):
+        _logger.info(f"Bootstrapping NFS kernel server from cached image {_NFS_SERVER_IMAGE}")
+        config["source"] = {"alias": _NFS_SERVER_IMAGE, "type": "image"}
+        client.instances.create(config, wait=True)
+        instance = client.instances.get(config["name"])
+        instance.start(wait=True)
+        return _nfs_endpoint(instance, use_ipv6)
+
+    _logger.info("Bootstrapping minimal NFS kernel server")
     client.instances.create(config, wait=True)
     instance = client.instances.get(config["name"])
     instance.start(wait=True)
     _logger.info("Installing NFS server inside LXD container")
     instance.execute(
-        ["apt-get", "-y", "update"], environment={"DEBIAN_FRONTEND": "noninteractive"}
-    )
-    instance.execute(
-        ["apt-get", "-y", "upgrade"], environment={"DEBIAN_FRONTEND": "noninteractive"}
-    )
-    instance.execute(
-        ["apt-get", "-y", "install", "nfs-kernel-server"],
+        [
+            "sh",
+            "-c",
+            "apt-get update && apt-get install -y --no-install-recommends nfs-kernel-server",
+        ],
         environment={"DEBIAN_FRONTEND": "noninteractive"},
     )
     exports = textwrap.dedent(
@@ -87,11 +97,33 @@ def bootstrap_nfs_server(use_ipv6: bool) -> str:
     _logger.info(f"Uploading the following /etc/exports file:\n{exports}")
     instance.files.put("/etc/exports", exports)
     _logger.info("Starting NFS server")
-    instance.execute(["mkdir", "-p", "/data"])
-    instance.execute(["exportfs", "-a"])
-    instance.execute(["systemctl", "restart", "nfs-kernel-server"])
-    for i in ["1", "2", "3"]:
-        instance.execute(["touch", f"/data/test-{i}"])
+    instance.execute(
+        ["sh", "-c", "mkdir -p /data && exportfs -a && systemctl restart nfs-kernel-server"]
+    )
+    instance.execute(["touch", "/data/test-1", "/data/test-2", "/data/test-3"])
+    if cache_image:
+        _logger.info(f"Caching configured NFS kernel server as image {_NFS_SERVER_IMAGE}")
+        snapshot = instance.snapshots.create(_NFS_SERVER_IMAGE, wait=True)
+        image = snapshot.publish(wait=True)
+        image.add_alias(_NFS_SERVER_IMAGE, "NFS kernel server for nfs-client integration tests")
+    return _nfs_endpoint(instance, use_ipv6)
+
+
+@tenacity.retry(
+    wait=tenacity.wait.wait_fixed(2),
+    stop=tenacity.stop_after_delay(60),
+    retry=tenacity.retry_if_exception_type((KeyError, IndexError)),
+    reraise=True,
+)
+def _nfs_endpoint(instance, use_ipv6: bool) -> str:
+    """Get the NFS URL endpoint of the NFS kernel server.
+
+    Notes:
+        Retries until the instance has been assigned an address on `eth0`.
+
+    Returns:
+        str: NFS URL endpoint.
+    """
     address = instance.state().network["eth0"]["addresses"][int(use_ipv6)]["address"]
     if use_ipv6:
         endpoint = f"nfs://[{address}]/data"
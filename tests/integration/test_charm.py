@@ -10,9 +10,7 @@ import pathlib
 from typing import Any, Coroutine
 
 import pytest
-import tenacity
 from helpers import bootstrap_nfs_server, modify_lxd_config
-from pylxd import Client
 from pytest_operator.plugin import OpsTest
 
 logger = logging.getLogger(__name__)
@@ -32,9 +30,12 @@ async def test_build_and_deploy(
     use_ipv6: bool,
 ) -> None:
     """Test that nfs-client can stabilize against nfs-server-proxy."""
-    charm = str(await nfs_client_charm)
+    # Reconfigure `lxdbr0` before building since the build container is attached to it.
     modify_lxd_config(use_ipv6)
-    endpoint = bootstrap_nfs_server(use_ipv6)
+    charm, endpoint = await asyncio.gather(
+        nfs_client_charm, asyncio.to_thread(bootstrap_nfs_server, use_ipv6)
+    )
+    charm = str(charm)
     logger.info(f"Deploying {NFS_CLIENT} against {NFS_SERVER_PROXY} and {BASE}")
     await asyncio.gather(
         ops_test.model.deploy(
@@ -61,8 +62,10 @@ async def test_build_and_deploy(
         ),
     )
     # Set integrations for charmed applications
-    await ops_test.model.integrate(f"{NFS_CLIENT}:juju-info", f"{BASE}:juju-info")
-    await ops_test.model.integrate(f"{NFS_CLIENT}:nfs-share", f"{NFS_SERVER_PROXY}:nfs-share")
+    await asyncio.gather(
+        ops_test.model.integrate(f"{NFS_CLIENT}:juju-info", f"{BASE}:juju-info"),
+        ops_test.model.integrate(f"{NFS_CLIENT}:nfs-share", f"{NFS_SERVER_PROXY}:nfs-share"),
+    )
     # Reduce the update status frequency to accelerate the triggering of deferred events.
     async with ops_test.fast_forward():
         await ops_test.model.wait_for_idle(apps=[NFS_CLIENT], status="active", timeout=1000)
@@ -71,13 +74,9 @@ async def test_build_and_deploy(
 
 @pytest.mark.abort_on_fail
 @pytest.mark.order(2)
-@tenacity.retry(
-    wait=tenacity.wait.wait_exponential(multiplier=2, min=1, max=30),
-    stop=tenacity.stop_after_attempt(3),
-    reraise=True,
-)
 async def test_share_active(ops_test: OpsTest) -> None:
     """Test that NFS share is successfully mounted on principle base charm."""
+    await ops_test.model.wait_for_idle(apps=[BASE], status="active", timeout=300)
     logger.info(f"Checking that /data is mounted on principle charm {BASE}")
     base_unit = ops_test.model.applications[BASE].units[0]
     result = (await base_unit.ssh("ls /data")).strip("\n")
@@ -93,6 +92,8 @@ async def test_automount_on_reboot(ops_test: OpsTest) -> None:
     base_unit = ops_test.model.applications[BASE].units[0]
     instance_id = base_unit.machine.safe_data["instance-id"]
 
+    from pylxd import Client
+
     logger.info(f"Restarting machine {instance_id} for principle charm {BASE}")
     client = Client()
     instance = client.instances.get(instance_id)
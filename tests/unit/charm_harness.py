@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Helpers shared by the nfs-client Harness unit tests."""
+
+import copy
+
+from charm import _STORED_DEFAULTS, NFSClientCharm
+
+
+def reset_stored_state(charm: NFSClientCharm) -> None:
+    """Reset the stored state of a charm shared between tests to its defaults."""
+    for key, value in copy.deepcopy(_STORED_DEFAULTS).items():
+        setattr(charm._stored, key, value)
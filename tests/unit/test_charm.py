@@ -8,30 +8,43 @@ import unittest
 from unittest.mock import PropertyMock, patch
 
 import ops.testing
-from ops.model import BlockedStatus, MaintenanceStatus, WaitingStatus
+from charm_harness import reset_stored_state
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.testing import Harness
 
 import utils.manager as nfs
 from charm import NFSClientCharm
 
 
+def setUpModule() -> None:
+    ops.testing.SIMULATE_CAN_CONNECT = True
+
+
+def tearDownModule() -> None:
+    ops.testing.SIMULATE_CAN_CONNECT = False
+
+
 class TestCharm(unittest.TestCase):
     """Test nfs-client charmed operator."""
 
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.harness = Harness(NFSClientCharm)
+        cls.harness.begin()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.harness.cleanup()
+
     def setUp(self) -> None:
-        ops.testing.SIMULATE_CAN_CONNECT = True
-        self.addCleanup(setattr, ops.testing, "SIMULATE_CAN_CONNECT", False)
-        self.harness = Harness(NFSClientCharm)
-        self.addCleanup(self.harness.cleanup)
-        self.harness.begin()
+        reset_stored_state(self.harness.charm)
+        self.harness.model.unit.status = MaintenanceStatus("")
 
     @patch("utils.manager.install")
     def test_install(self, _) -> None:
         """Test that nfs-client can successfully be installed."""
         self.harness.charm.on.install.emit()
-        self.assertEqual(
-            self.harness.model.unit.status, MaintenanceStatus("Installing required packages")
-        )
+        self.assertEqual(self.harness.model.unit.status, BlockedStatus("No configured mountpoint"))
 
     @patch("utils.manager.install", side_effect=nfs.Error("Failed to install `nfs-common`"))
     def test_install_fail(self, _) -> None:
@@ -45,8 +58,32 @@ class TestCharm(unittest.TestCase):
     def test_upgrade_charm(self, _) -> None:
         """Test that nfs-client installs packages after upgrade."""
         self.harness.charm.on.upgrade_charm.emit()
+        self.assertEqual(self.harness.model.unit.status, BlockedStatus("No configured mountpoint"))
+
+    @patch("utils.manager.install")
+    @patch(
+        "charm.NFSClientCharm.config", new_callable=PropertyMock(return_value={"mountpoint": None})
+    )
+    def test_upgrade_charm_no_mountpoint(self, *_) -> None:
+        """Test that the unit stays blocked after upgrade without a configured mountpoint."""
+        self.harness.charm.on.config_changed.emit()
+        self.harness.charm.on.upgrade_charm.emit()
+        self.harness.charm.on.config_changed.emit()
+        self.assertEqual(self.harness.model.unit.status, BlockedStatus("No configured mountpoint"))
+
+    @patch("utils.manager.mounted", return_value=True)
+    @patch("utils.manager.install")
+    @patch(
+        "charm.NFSClientCharm.config",
+        new_callable=PropertyMock(return_value={"mountpoint": "/data"}),
+    )
+    def test_upgrade_charm_config_unchanged(self, *_) -> None:
+        """Test that the share status is restored when config is unchanged after upgrade."""
+        self.harness.charm.on.config_changed.emit()
+        self.harness.charm.on.upgrade_charm.emit()
+        self.harness.charm.on.config_changed.emit()
         self.assertEqual(
-            self.harness.model.unit.status, MaintenanceStatus("Installing required packages")
+            self.harness.model.unit.status, ActiveStatus("NFS share mounted at /data")
         )
 
     @patch("utils.manager.install", side_effect=nfs.Error("Failed to install `nfs-common`"))
@@ -65,14 +102,30 @@ class TestCharm(unittest.TestCase):
         self.harness.charm.on.config_changed.emit()
         self.assertEqual(self.harness.model.unit.status, BlockedStatus("No configured mountpoint"))
 
+    @patch("utils.manager.mountpoint_to_autofs_id", return_value="data")
     @patch(
         "charm.NFSClientCharm.config",
         new_callable=PropertyMock(return_value={"mountpoint": "/data"}),
     )
-    def test_config_set_mountpoint(self, _) -> None:
+    def test_config_set_mountpoint(self, _, mountpoint_to_autofs_id) -> None:
         """Test config changed handler when new mountpoint is available."""
         self.harness.charm.on.config_changed.emit()
         self.assertEqual(self.harness.model.unit.status, WaitingStatus("Waiting for NFS share"))
+        mountpoint_to_autofs_id.assert_called_once_with("/data")
+        self.assertEqual(self.harness.charm._stored.autofs_id, "data")
+
+    @patch(
+        "charm.NFSClientCharm.config",
+        new_callable=PropertyMock(return_value={"mountpoint": "/data"}),
+    )
+    def test_config_unchanged(self, _) -> None:
+        """Test config changed handler when no configuration value has changed."""
+        self.harness.charm.on.config_changed.emit()
+        self.harness.model.unit.status = ActiveStatus("NFS share mounted at /data")
+        self.harness.charm.on.config_changed.emit()
+        self.assertEqual(
+            self.harness.model.unit.status, ActiveStatus("NFS share mounted at /data")
+        )
 
     @patch(
         "charm.NFSClientCharm.config",
@@ -103,11 +156,30 @@ class TestCharm(unittest.TestCase):
 
     @patch("utils.manager.mounted", return_value=True)
     @patch.object(nfs, "umount")
-    @patch("utils.manager.mounts", return_value=[])
+    @patch("utils.manager.snapshot", return_value=nfs.MountTable([]))
     @patch.object(nfs, "remove")
-    def test_on_stop(self, remove, mounts, umount, mounted) -> None:
+    def test_on_stop(self, remove, snapshot, umount, mounted) -> None:
         """Test on stop handler."""
         self.harness.charm.on.stop.emit()
         umount.assert_called_once()
         remove.assert_called_once()
         self.assertEqual(self.harness.model.unit.status, MaintenanceStatus("Shutting down..."))
+
+    @patch("utils.manager.mounted", return_value=True)
+    @patch.object(nfs, "umount")
+    @patch("utils.manager.snapshot")
+    @patch.object(nfs, "remove")
+    @patch(
+        "charm.NFSClientCharm.config",
+        new_callable=PropertyMock(return_value={"mountpoint": "/data"}),
+    )
+    def test_on_stop_nfs_mounts_remain(self, _, remove, snapshot, umount, mounted) -> None:
+        """Test on stop handler when NFS shares are still mounted after the umount."""
+        for mountpoint in ("/srv", "/data"):
+            with self.subTest(mountpoint=mountpoint):
+                snapshot.return_value = nfs.MountTable(
+                    [nfs.MountInfo("127.0.0.1:/data", mountpoint, "nfs4", "rw", "0", "0")]
+                )
+                self.harness.charm.on.stop.emit()
+                umount.assert_called()
+                remove.assert_not_called()
@@ -15,7 +15,7 @@ from unittest.mock import patch
 
 import charms.operator_libs_linux.v0.apt as apt
 import charms.operator_libs_linux.v1.systemd as systemd
-from pyfakefs.fake_filesystem_unittest import TestCase
+import pytest
 
 import utils.manager as nfs
 
@@ -33,265 +33,461 @@ class MountParams:
     map_data: str
 
 
-@patch("charms.operator_libs_linux.v1.systemd.service_reload")
-@patch("subprocess.run")
-class TestNFSManager(TestCase):
-    """Test nfs manager utils."""
-
-    def setUp(self) -> None:
-        self.setUpPyfakefs()
-        self.fs.create_dir("/etc/auto.master.d")
-        self.fs.create_file(
-            "/proc/mounts",
-            contents=textwrap.dedent(
-                """\
-                /dev/sda1 / ext4 rw,relatime,discard,errors=remount-ro 0 0
-                192.168.1.150:/data /data nfs4 rw,relatime,vers=4.2 0 0
-                [ffcc:aabb::10]:/things /things nfs rw 0 0
-                nsfs /run/snapd/ns/lxd.mnt nsfs rw 0 0
-                /etc/auto.data /data autofs rw,relatime 0 0
-                tmpfs /run/lock tmpfs rw,nosuid,nodev,noexec,relatime 0 0
-                """,
-            ),
-        )
-        self.data_mount = nfs.MountInfo(
-            "192.168.1.150:/data", "/data", "nfs4", "rw,relatime,vers=4.2", "0", "0"
-        )
-        self.things_mount = nfs.MountInfo(
-            "[ffcc:aabb::10]:/things", "/things", "nfs", "rw", "0", "0"
-        )
+VALID_MOUNT_CASES = [
+    # IPv4
+    MountParams(
+        endpoint="nfs://192.168.1.254/things",
+        mountpoint="/things",
+        options=[],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things",
+        map_file="/etc/auto.things",
+        map_data="/things 192.168.1.254:/things",
+    ),
+    # IPv4 + options
+    MountParams(
+        endpoint="nfs://192.168.1.254/things",
+        mountpoint="/things",
+        options=["some", "opts"],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things some,opts",
+        map_file="/etc/auto.things",
+        map_data="/things 192.168.1.254:/things",
+    ),
+    # IPv4 + port + options
+    MountParams(
+        endpoint="nfs://192.168.1.254:2049/things",
+        mountpoint="/things",
+        options=["some", "opts"],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things some,opts,port=2049",
+        map_file="/etc/auto.things",
+        map_data="/things 192.168.1.254:/things",
+    ),
+    # IPv6
+    MountParams(
+        endpoint="nfs://[fd42:7650:65a::dbf5:b3c:5961]/things",
+        mountpoint="/things",
+        options=[],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things",
+        map_file="/etc/auto.things",
+        map_data="/things [fd42:7650:65a::dbf5:b3c:5961]:/things",
+    ),
+    # IPv6 + port + options
+    MountParams(
+        endpoint="nfs://[fd42:7650:65a::dbf5:b3c:5961]:2049/things",
+        mountpoint="/things",
+        options=["some", "opts"],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things some,opts,port=2049",
+        map_file="/etc/auto.things",
+        map_data="/things [fd42:7650:65a::dbf5:b3c:5961]:/things",
+    ),
+    # hostname
+    MountParams(
+        endpoint="nfs://server.com/things",
+        mountpoint="/things",
+        options=[],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things",
+        map_file="/etc/auto.things",
+        map_data="/things server.com:/things",
+    ),
+    # hostname + port + options
+    MountParams(
+        endpoint="nfs://server.com:65535/things",
+        mountpoint="/things",
+        options=["some", "opts"],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things some,opts,port=65535",
+        map_file="/etc/auto.things",
+        map_data="/things server.com:/things",
+    ),
+    # hostname with dot
+    MountParams(
+        endpoint="nfs://server.com./things",
+        mountpoint="/things",
+        options=[],
+        master_file="/etc/auto.master.d/things.autofs",
+        master_data="/- /etc/auto.things",
+        map_file="/etc/auto.things",
+        map_data="/things server.com.:/things",
+    ),
+]
+
+INVALID_MOUNT_CASES = [
+    # Missing protocol
+    "192.168.1.254/things",
+    # Invalid protocol
+    "ssh://192.168.1.254/things",
+    # IPv6 without brackets
+    "nfs://ffff:eeee::cccc:bbbb:2049/things",
+    # IPv6 with invalid brackets
+    "nfs://[ffff:eeee::cccc:bbbb:2049/things",
+    # Invalid port
+    "nfs://hostname:abc/things",
+    # Queries
+    "nfs://endpoint.com?query1=1&query2=2/things",
+    # Fragments
+    "nfs://endpoint.com#fragment/things",
+    # Empty host
+    "nfs:///things",
+]
+
+VALID_FETCH_CASES = [
+    ("nfs://192.168.1.150/data", "data_mount"),
+    ("/data", "data_mount"),
+    ("nfs://[ffcc:aabb::10]/things", "things_mount"),
+    ("/things", "things_mount"),
+]
+
+INVALID_FETCH_CASES = ["/dev/sda1", "/", "192.168.1.1:/data", "/datum", "/etc/auto.data"]
+
+_PROC_MOUNTS = textwrap.dedent(
+    """\
+    /dev/sda1 / ext4 rw,relatime,discard,errors=remount-ro 0 0
+    192.168.1.150:/data /data nfs4 rw,relatime,vers=4.2 0 0
+    [ffcc:aabb::10]:/things /things nfs rw 0 0
+    nsfs /run/snapd/ns/lxd.mnt nsfs rw 0 0
+    /etc/auto.data /data autofs rw,relatime 0 0
+    tmpfs /run/lock tmpfs rw,nosuid,nodev,noexec,relatime 0 0
+    """,
+)
+
+
+@pytest.fixture
+def nfs_fs(fs_module):
+    """Fake filesystem with autofs configuration directory and mounted NFS shares.
+
+    Notes:
+        The fake filesystem is patched in once per module and reset for every test.
+    """
+    fs_module.reset()
+    fs_module.create_dir("/etc/auto.master.d")
+    fs_module.create_file("/proc/mounts", contents=_PROC_MOUNTS)
+    return fs_module
+
+
+@pytest.fixture(scope="session")
+def data_mount() -> nfs.MountInfo:
+    """Mount information of the NFS share mounted at /data."""
+    return nfs.MountInfo("192.168.1.150:/data", "/data", "nfs4", "rw,relatime,vers=4.2", "0", "0")
+
+
+@pytest.fixture(scope="session")
+def things_mount() -> nfs.MountInfo:
+    """Mount information of the NFS share mounted at /things."""
+    return nfs.MountInfo("[ffcc:aabb::10]:/things", "/things", "nfs", "rw", "0", "0")
+
+
+@pytest.fixture(scope="module")
+def _module_mocks():
+    """Mock `subprocess.run` and reloading systemd services once for the whole module."""
+    with patch("subprocess.run") as subproc, patch(
+        "charms.operator_libs_linux.v1.systemd.service_reload"
+    ) as reload:
+        yield subproc, reload
+
+
+@pytest.fixture(autouse=True)
+def mocks(_module_mocks):
+    """Reset the module-wide mocks before every test."""
+    for mock in _module_mocks:
+        mock.reset_mock(return_value=True, side_effect=True)
+    return _module_mocks
+
+
+@pytest.fixture
+def subproc(mocks):
+    """Mock `subprocess.run`."""
+    return mocks[0]
+
+
+@pytest.fixture
+def reload(mocks):
+    """Mock reloading systemd services."""
+    return mocks[1]
+
+
+@pytest.fixture(autouse=True)
+def _clear_supported_cache():
+    """Clear the cached virtualization check between tests."""
+    nfs.supported.cache_clear()
+    yield
+    nfs.supported.cache_clear()
+
+
+@pytest.mark.parametrize("case", VALID_MOUNT_CASES)
+def test_mount_valid_endpoint(case, nfs_fs) -> None:
+    """Test that various kinds of endpoints can be properly mounted."""
+    nfs.mount(case.endpoint, case.mountpoint, case.options)
+
+    assert Path(case.master_file).read_text() == case.master_data
+    assert Path(case.map_file).read_text() == case.map_data
+
+
+@pytest.mark.parametrize("case", INVALID_MOUNT_CASES)
+def test_mount_invalid_endpoint(case, nfs_fs) -> None:
+    """Test that malformed endpoints are rejected."""
+    with pytest.raises(nfs.Error):
+        nfs.mount(case, "/data")
+
+
+def test_translate_prefix(caplog) -> None:
+    """Test that only targets with an nfs:// prefix are parsed as NFS URLs."""
+    with caplog.at_level("DEBUG", logger="utils.manager"):
+        assert nfs._translate("/data") is None
+        assert nfs._translate("192.168.1.254:/data") is None
+        assert nfs._translate(None) is None
+    assert not caplog.records
+
+    assert nfs._translate("NFS://192.168.1.254/data") == ("192.168.1.254:/data", None)
+
+
+def test_mount_systemd_error(subproc, reload, nfs_fs) -> None:
+    """Test that the mount operation correctly raises if systemd cannot reload the service."""
+    subproc.return_value = SimpleNamespace(stdout="kvm")
+
+    # Normal error
+    reload.side_effect = systemd.SystemdError("error message")
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount("nfs://192.168.1.254:2049/data", "/data")
+    assert e.value.message == "Failed to mount 192.168.1.254:/data at /data"
 
-    def test_mount_valid_endpoint(self, *_) -> None:
-        """Test that various kinds of endpoints can be properly mounted."""
-        cases = [
-            # IPv4
-            MountParams(
-                endpoint="nfs://192.168.1.254/things",
-                mountpoint="/things",
-                options=[],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things",
-                map_file="/etc/auto.things",
-                map_data="/things 192.168.1.254:/things",
-            ),
-            # IPv4 + options
-            MountParams(
-                endpoint="nfs://192.168.1.254/things",
-                mountpoint="/things",
-                options=["some", "opts"],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things some,opts",
-                map_file="/etc/auto.things",
-                map_data="/things 192.168.1.254:/things",
-            ),
-            # IPv4 + port + options
-            MountParams(
-                endpoint="nfs://192.168.1.254:2049/things",
-                mountpoint="/things",
-                options=["some", "opts"],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things some,opts,port=2049",
-                map_file="/etc/auto.things",
-                map_data="/things 192.168.1.254:/things",
-            ),
-            # IPv6
-            MountParams(
-                endpoint="nfs://[fd42:7650:65a::dbf5:b3c:5961]/things",
-                mountpoint="/things",
-                options=[],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things",
-                map_file="/etc/auto.things",
-                map_data="/things [fd42:7650:65a::dbf5:b3c:5961]:/things",
-            ),
-            # IPv6 + port + options
-            MountParams(
-                endpoint="nfs://[fd42:7650:65a::dbf5:b3c:5961]:2049/things",
-                mountpoint="/things",
-                options=["some", "opts"],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things some,opts,port=2049",
-                map_file="/etc/auto.things",
-                map_data="/things [fd42:7650:65a::dbf5:b3c:5961]:/things",
-            ),
-            # hostname
-            MountParams(
-                endpoint="nfs://server.com/things",
-                mountpoint="/things",
-                options=[],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things",
-                map_file="/etc/auto.things",
-                map_data="/things server.com:/things",
-            ),
-            # hostname + port + options
-            MountParams(
-                endpoint="nfs://server.com:65535/things",
-                mountpoint="/things",
-                options=["some", "opts"],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things some,opts,port=65535",
-                map_file="/etc/auto.things",
-                map_data="/things server.com:/things",
-            ),
-            # hostname with dot
-            MountParams(
-                endpoint="nfs://server.com./things",
-                mountpoint="/things",
-                options=[],
-                master_file="/etc/auto.master.d/things.autofs",
-                master_data="/- /etc/auto.things",
-                map_file="/etc/auto.things",
-                map_data="/things server.com.:/things",
-            ),
-        ]
+    # Operation not permitted but not LXC virtualization
+    reload.side_effect = systemd.SystemdError("Operation not permitted")
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount("nfs://192.168.1.254:2049/data", "/data")
+    assert e.value.message == "Failed to mount 192.168.1.254:/data at /data"
+
+    subproc.return_value = SimpleNamespace(stdout="lxc")
+    nfs.supported.cache_clear()
 
-        for case in cases:
-            with self.subTest(
-                endpoint=case.endpoint, mountpoint=case.mountpoint, options=case.options
-            ):
-                nfs.mount(case.endpoint, case.mountpoint, case.options)
-
-                master_data = Path(case.master_file).read_text()
-                self.assertEqual(case.master_data, master_data)
-                map_data = Path(case.map_file).read_text()
-                self.assertEqual(case.map_data, map_data)
-
-    def test_mount_invalid_endpoint(self, *_) -> None:
-        """Test that malformed endpoints are rejected."""
-        cases = [
-            # Missing protocol
-            "192.168.1.254/things",
-            # Invalid protocol
-            "ssh://192.168.1.254/things",
-            # IPv6 without brackets
-            "nfs://ffff:eeee::cccc:bbbb:2049/things",
-            # IPv6 with invalid brackets
-            "nfs://[ffff:eeee::cccc:bbbb:2049/things",
-            # Invalid port
-            "nfs://hostname:abc/things",
-            # Queries
-            "nfs://endpoint.com?query1=1&query2=2/things",
-            # Fragments
-            "nfs://endpoint.com#fragment/things",
-            # Empty host
-            "nfs:///things",
-        ]
+    # Normal error on LXC virtualization
+    reload.side_effect = systemd.SystemdError("error message")
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount("nfs://192.168.1.254:2049/data", "/data")
+    assert e.value.message == "Failed to mount 192.168.1.254:/data at /data"
+
+    # Operation not permitted on LXC virtualization. Should show a useful error message.
+    reload.side_effect = systemd.SystemdError("Operation not permitted")
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount("nfs://192.168.1.254:2049/data", "/data")
+    assert e.value.message == "Mounting NFS shares not supported on LXD containers"
+    # Virtualization is only detected once per process.
+    with pytest.raises(nfs.Error):
+        nfs.mount("nfs://192.168.1.254:2049/data", "/data")
+    assert subproc.call_count == 2
 
-        for case in cases:
-            with self.subTest(endpoint=case), self.assertRaises(nfs.Error):
-                nfs.mount(case, "/data")
-
-    def test_mount_systemd_error(self, subproc, reload, *_):
-        """Test that the mount operation correctly raises if systemd cannot reload the service."""
-        subproc.return_value = SimpleNamespace(stdout="kvm")
-
-        # Normal error
-        reload.side_effect = systemd.SystemdError("error message")
-        with self.assertRaises(nfs.Error) as sup:
-            nfs.mount("nfs://192.168.1.254:2049/data", "/data")
-        self.assertEqual(sup.exception.message, "Failed to mount 192.168.1.254:/data at /data")
-
-        # Operation not permitted but not LXC virtualization
-        reload.side_effect = systemd.SystemdError("Operation not permitted")
-        with self.assertRaises(nfs.Error) as sup:
-            nfs.mount("nfs://192.168.1.254:2049/data", "/data")
-        self.assertEqual(sup.exception.message, "Failed to mount 192.168.1.254:/data at /data")
-
-        subproc.return_value = SimpleNamespace(stdout="lxc")
-
-        # Normal error on LXC virtualization
-        reload.side_effect = systemd.SystemdError("error message")
-        with self.assertRaises(nfs.Error) as sup:
-            nfs.mount("nfs://192.168.1.254:2049/data", "/data")
-        self.assertEqual(sup.exception.message, "Failed to mount 192.168.1.254:/data at /data")
-
-        # Operation not permitted on LXC virtualization. Should show a useful error message.
-        reload.side_effect = systemd.SystemdError("Operation not permitted")
-        with self.assertRaises(nfs.Error) as sup:
-            nfs.mount("nfs://192.168.1.254:2049/data", "/data")
-        self.assertEqual(
-            sup.exception.message, "Mounting NFS shares not supported on LXD containers"
-        )
-
-        # Error trying to check the virtualization type. Should throw the normal error message
-        # for good measure.
-        subproc.side_effect = CalledProcessError(-1, "error message")
-        with self.assertRaises(nfs.Error) as sup:
-            nfs.mount("nfs://192.168.1.254:2049/data", "/data")
-        self.assertEqual(sup.exception.message, "Failed to mount 192.168.1.254:/data at /data")
-
-    @patch("charms.operator_libs_linux.v0.apt.add_package")
-    def test_install(self, add_package, *_):
-        """Test that the install operation correctly succeeds or bails on error."""
-        nfs.install()
+    # Error trying to check the virtualization type. Should throw the normal error message
+    # for good measure.
+    subproc.side_effect = CalledProcessError(-1, "error message")
+    nfs.supported.cache_clear()
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount("nfs://192.168.1.254:2049/data", "/data")
+    assert e.value.message == "Failed to mount 192.168.1.254:/data at /data"
 
-        add_package.side_effect = apt.PackageError("error message")
-        with self.assertRaises(nfs.Error) as e:
-            nfs.install()
 
-        self.assertEqual(e.exception.message, "error message")
+def test_mount_umount_autofs_id(nfs_fs) -> None:
+    """Test that a provided autofs id is used instead of deriving it from the mountpoint."""
+    nfs.mount("nfs://192.168.1.254/data", "/data", autofs_id="srv-data")
+    assert Path("/etc/auto.master.d/srv-data.autofs").read_text() == "/- /etc/auto.srv-data"
+    assert Path("/etc/auto.srv-data").read_text() == "/data 192.168.1.254:/data"
+
+    nfs.umount("/data", autofs_id="srv-data")
+    assert not nfs_fs.exists("/etc/auto.srv-data")
+    assert not nfs_fs.exists("/etc/auto.master.d/srv-data.autofs")
+
+
+def test_mount_many(reload, nfs_fs) -> None:
+    """Test that mounting multiple shares reloads autofs only once."""
+    nfs.mount_many(
+        [
+            ("nfs://192.168.1.254/data", "/data", ["rw"]),
+            ("nfs://[ffcc:aabb::10]:2049/things", "/things", ["ro"]),
+        ]
+    )
+
+    reload.assert_called_once_with("autofs", restart_on_failure=True)
+    assert Path("/etc/auto.master.d/data.autofs").read_text() == "/- /etc/auto.data rw"
+    assert Path("/etc/auto.data").read_text() == "/data 192.168.1.254:/data"
+    assert Path("/etc/auto.master.d/things.autofs").read_text() == (
+        "/- /etc/auto.things ro,port=2049"
+    )
+    assert Path("/etc/auto.things").read_text() == "/things [ffcc:aabb::10]:/things"
+
+    reload.side_effect = systemd.SystemdError("error message")
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount_many(
+            [("nfs://192.168.1.254/data", "/data", []), ("nfs://server.com/srv", "/srv", [])]
+        )
+    assert e.value.message == (
+        "Failed to mount 192.168.1.254:/data at /data, server.com:/srv at /srv"
+    )
 
-    @patch("charms.operator_libs_linux.v0.apt.remove_package")
-    def test_remove(self, remove_package, *_):
-        """Test that the remove operation never bails on error, but fails on package error."""
-        # Sunny day
-        nfs.remove()
 
-        remove_package.side_effect = apt.PackageNotFoundError("error message")
-        # Rainy day
-        nfs.remove()
+def test_mount_many_invalid_endpoint(reload, nfs_fs) -> None:
+    """Test that no share is configured if any endpoint to mount is invalid."""
+    with pytest.raises(nfs.Error) as e:
+        nfs.mount_many(
+            [("nfs://192.168.1.254/data", "/data", []), ("ssh://server.com/srv", "/srv", [])]
+        )
+    assert e.value.message == "Cannot translate invalid endpoint url ssh://server.com/srv"
+    reload.assert_not_called()
+    assert not nfs_fs.exists("/data")
+    assert not nfs_fs.exists("/etc/auto.data")
+    assert not nfs_fs.exists("/etc/auto.master.d/data.autofs")
+
+
+@patch("charms.operator_libs_linux.v0.apt.add_package")
+def test_install(add_package, nfs_fs) -> None:
+    """Test that the install operation correctly succeeds or bails on error."""
+    nfs.install()
+    assert add_package.call_args.kwargs["update_cache"]
+
+    # Skip refreshing the apt cache if it was recently updated.
+    nfs_fs.create_file("/var/lib/apt/periodic/update-success-stamp")
+    nfs.install()
+    assert not add_package.call_args.kwargs["update_cache"]
+
+    add_package.side_effect = apt.PackageError("error message")
+    with pytest.raises(nfs.Error) as e:
+        nfs.install()
 
-        remove_package.side_effect = apt.PackageError("error message")
-        with self.assertRaises(nfs.Error):
-            nfs.remove()
-
-    def test_fetch_valid(self, *_):
-        """Test that the fetch operation fetches all defined nfs mounts."""
-        cases = [
-            ("nfs://192.168.1.150/data", self.data_mount),
-            ("/data", self.data_mount),
-            ("nfs://[ffcc:aabb::10]/things", self.things_mount),
-            ("/things", self.things_mount),
-        ]
+    assert e.value.message == "error message"
 
-        for case, info in cases:
-            with self.subTest(target=case):
-                self.assertEqual(nfs.fetch(case), info)
 
-    def test_fetch_invalid(self, *_):
-        """Test that the fetch operation cannot fetch unknown or invalid mounts."""
-        cases = ["/dev/sda1", "/", "192.168.1.1:/data", "/datum", "/etc/auto.data"]
+@patch("charms.operator_libs_linux.v0.apt.remove_package")
+def test_remove(remove_package, nfs_fs) -> None:
+    """Test that the remove operation never bails on error, but fails on package error."""
+    # Sunny day
+    nfs.remove()
 
-        for case in cases:
-            with self.subTest(target=case):
-                self.assertIsNone(nfs.fetch(case))
+    remove_package.side_effect = apt.PackageNotFoundError("error message")
+    # Rainy day
+    nfs.remove()
 
-    def test_mounts(self, *_):
-        """Test that the mounts operation returns only nfs mounts."""
-        self.assertEqual(nfs.mounts(), [self.data_mount, self.things_mount])
+    remove_package.side_effect = apt.PackageError("error message")
+    with pytest.raises(nfs.Error):
+        nfs.remove()
 
-    def test_umount(self, _subprocess, reload, *_):
-        """Test that the umount operation correctly deletes files and raises if systemd raises."""
-        self.fs.create_dir("/data")
-        self.fs.create_file("/etc/auto.data")
-        self.fs.create_file("/etc/auto.master.d/data.autofs")
 
+@pytest.mark.parametrize("target,expected", VALID_FETCH_CASES)
+def test_fetch_valid(target, expected, request, nfs_fs) -> None:
+    """Test that the fetch operation fetches all defined nfs mounts."""
+    assert nfs.fetch(target) == request.getfixturevalue(expected)
+
+
+@patch("utils.manager._automount")
+def test_fetch_trigger_autofs(automount, nfs_fs) -> None:
+    """Test that fetching a mountpoint only triggers the autofs mount at that path."""
+    nfs.fetch("/things")
+    automount.assert_not_called()
+
+    nfs.fetch("/data")
+    automount.assert_called_once_with("/data")
+
+    automount.reset_mock()
+    nfs.fetch("nfs://[ffcc:aabb::10]/things")
+    automount.assert_called_once_with("/data")
+
+    automount.reset_mock()
+    nfs.fetch("[ffcc:aabb::10]:/things")
+    automount.assert_called_once_with("/data")
+
+
+@pytest.mark.parametrize("target", INVALID_FETCH_CASES)
+def test_fetch_invalid(target, nfs_fs) -> None:
+    """Test that the fetch operation cannot fetch unknown or invalid mounts."""
+    assert nfs.fetch(target) is None
+
+
+def test_mounted(nfs_fs) -> None:
+    """Test that the mounted operation only reports nfs mounts."""
+    nfs_fs.add_mount_point("/data")
+    nfs_fs.add_mount_point("/etc/auto.data")
+    assert nfs.mounted("/data")
+    assert nfs.mounted("nfs://[ffcc:aabb::10]/things")
+    # Mountpoint without an nfs mount in /proc/mounts.
+    assert not nfs.mounted("/etc/auto.data")
+    assert not nfs.mounted(None)
+    # Not a mountpoint, so /proc/mounts is never read.
+    nfs_fs.remove("/proc/mounts")
+    assert not nfs.mounted("/things")
+
+
+def test_snapshot(data_mount, things_mount, nfs_fs) -> None:
+    """Test that the snapshot operation indexes nfs mounts by endpoint and mountpoint."""
+    snapshot = nfs.snapshot()
+    assert list(snapshot) == [data_mount, things_mount]
+    assert snapshot.get("nfs://192.168.1.150/data") == data_mount
+    assert nfs.fetch("/things", snapshot) == things_mount
+    assert nfs.mounted("[ffcc:aabb::10]:/things", snapshot)
+    assert "/etc/auto.data" not in snapshot
+    assert nfs.fetch("/datum", snapshot) is None
+
+
+def test_trigger_autofs(nfs_fs, caplog) -> None:
+    """Test that automounts are triggered for every autofs mount and unexpected errors raise."""
+    nfs_fs.remove("/proc/mounts")
+    nfs_fs.create_file(
+        "/proc/mounts",
+        contents=textwrap.dedent(
+            """\
+            /etc/auto.data /data autofs rw,relatime 0 0
+            /etc/auto.home /home autofs rw,relatime 0 0
+            /etc/auto.things /things autofs rw,relatime 0 0
+            """,
+        ),
+    )
+    nfs_fs.create_dir("/data")
+    nfs_fs.create_dir("/home")
+
+    with caplog.at_level("WARNING", logger="utils.manager"):
+        nfs._trigger_autofs()
+
+    assert len(caplog.records) == 1
+    assert "/things" in caplog.records[0].getMessage()
+
+    with patch("utils.manager._automount", side_effect=RuntimeError("error message")):
+        with pytest.raises(RuntimeError):
+            nfs._trigger_autofs()
+
+
+def test_mounts(data_mount, things_mount, nfs_fs) -> None:
+    """Test that the mounts operation returns only nfs mounts."""
+    assert nfs.mounts() == [data_mount, things_mount]
+
+
+def test_umount(reload, nfs_fs) -> None:
+    """Test that the umount operation correctly deletes files and raises if systemd raises."""
+    nfs_fs.create_dir("/data")
+    nfs_fs.create_file("/etc/auto.data")
+    nfs_fs.create_file("/etc/auto.master.d/data.autofs")
+
+    nfs.umount("/data")
+
+    assert not nfs_fs.exists("/data")
+    assert not nfs_fs.exists("/etc/auto.data")
+    assert not nfs_fs.exists("/etc/auto.master.d/data.autofs")
+
+    reload.side_effect = systemd.SystemdError("error message")
+    with pytest.raises(nfs.Error) as e:
+        # umount cannot throw if the files don't exist, only if systemd raises an error.
         nfs.umount("/data")
 
-        self.assertFalse(self.fs.exists("/data"))
-        self.assertFalse(self.fs.exists("/etc/auto.data"))
-        self.assertFalse(self.fs.exists("/etc/auto.master.d/data.autofs"))
+    assert e.value.message == "Failed to unmount /data"
 
-        reload.side_effect = systemd.SystemdError("error message")
-        with self.assertRaises(nfs.Error) as e:
-            # umount cannot throw if the files don't exist, only if systemd raises an error.
-            nfs.umount("/data")
+    # Files that were shadowed by the mount must not be deleted.
+    reload.side_effect = None
+    nfs_fs.create_file("/data/shadowed")
+    nfs.umount("/data")
+    assert nfs_fs.exists("/data/shadowed")
 
-        self.assertEqual(e.exception.message, "Failed to unmount /data")
 
-    def test_error(self, *_):
-        """Test the properties of the Error class."""
-        error = nfs.Error("error message")
-        self.assertEqual(error.name, "<utils.manager.Error>")
-        self.assertEqual(repr(error), "<utils.manager.Error ('error message',)>")
+def test_error() -> None:
+    """Test the properties of the Error class."""
+    error = nfs.Error("error message")
+    assert error.name == "<utils.manager.Error>"
+    assert repr(error) == "<utils.manager.Error ('error message',)>"
@@ -5,163 +5,192 @@
 """Test nfs-share integration."""
 
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 import ops.testing
-from ops.model import ActiveStatus, BlockedStatus, WaitingStatus
+from charm_harness import reset_stored_state
+from ops.charm import ActionEvent
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.testing import Harness
 
 import utils.manager as nfs
 from charm import NFSClientCharm
 
+_DEFAULT_MOUNTINFO = nfs.MountInfo(
+    endpoint="127.0.0.1:/data",
+    mountpoint="/data",
+    fstype="nfs4",
+    options="some,thing",
+    freq="0",
+    passno="0",
+)
+_ERR_MOUNT_FAIL = nfs.Error("Failed to mount share")
+_ERR_UMOUNT_FAIL = nfs.Error("Failed to umount share")
+_STATUS_WAITING = WaitingStatus("Waiting for NFS share")
+
+
+def setUpModule() -> None:
+    ops.testing.SIMULATE_CAN_CONNECT = True
+
+
+def tearDownModule() -> None:
+    ops.testing.SIMULATE_CAN_CONNECT = False
+
+
+def _force_umount_event(mountpoint: str) -> Mock:
+    """Create a `force-umount` action event for the given mountpoint."""
+    return Mock(spec=ActionEvent, params={"mountpoint": mountpoint})
+
 
 class TestNFSShare(unittest.TestCase):
     """Test nfs-share integration."""
 
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.harness = Harness(NFSClientCharm)
+        cls.integration_id = cls.harness.add_relation("nfs-share", "nfs-server-proxy")
+        cls.harness.add_relation_unit(cls.integration_id, "nfs-server-proxy/0")
+        cls.harness.set_leader(True)
+        cls.harness.begin()
+        cls.integration = cls.harness.charm.model.get_relation("nfs-share", cls.integration_id)
+        cls.app = cls.harness.charm.model.get_app("nfs-server-proxy")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.harness.cleanup()
+
     def setUp(self) -> None:
-        ops.testing.SIMULATE_CAN_CONNECT = True
-        self.addCleanup(setattr, ops.testing, "SIMULATE_CAN_CONNECT", False)
-        self.harness = Harness(NFSClientCharm)
-        self.integration_id = self.harness.add_relation("nfs-share", "nfs-server-proxy")
-        self.harness.add_relation_unit(self.integration_id, "nfs-server-proxy/0")
-        self.harness.set_leader(True)
-        self.harness.begin()
+        # Reset charm state and integration data shared between tests.
+        reset_stored_state(self.harness.charm)
+        self.harness.model.unit.status = MaintenanceStatus("")
+        self.harness.update_relation_data(
+            self.integration_id, "nfs-server-proxy", {"endpoint": ""}
+        )
+
+        self.mock_mount = self._patch("mount")
+        self.mock_umount = self._patch("umount")
+        self.mock_mounted = self._patch("mounted")
+        self.mock_fetch = self._patch("fetch")
+
+    def _patch(self, name: str) -> MagicMock:
+        """Patch an NFS manager operation for the duration of the test."""
+        patcher = patch.object(nfs, name)
+        mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        return mock
+
+    def _assert_blocked(self, message: str) -> None:
+        """Assert that the unit is blocked with the given status message."""
+        status = self.harness.model.unit.status
+        self.assertIsInstance(status, BlockedStatus)
+        self.assertEqual(status.message, message)
 
     def test_server_connected_no_mountpoint(self) -> None:
         """Test server connected handler when there is no configured mountpoint."""
         # Patch charm stored state.
         self.harness.charm._stored.mountpoint = None
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.server_connected.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, BlockedStatus("No configured mountpoint"))
+        self.harness.charm._nfs_share.on.server_connected.emit(self.integration, self.app)
+        self._assert_blocked("No configured mountpoint")
 
     def test_server_connected(self) -> None:
         """Test server connected handler when mountpoint is configured."""
         # Patch charm stored state.
         self.harness.charm._stored.mountpoint = "/data"
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.server_connected.emit(integration, app)
+        self.harness.charm._nfs_share.on.server_connected.emit(self.integration, self.app)
+        self.assertEqual(
+            self.harness.get_relation_data(self.integration_id, "nfs-client")["name"], "/data"
+        )
 
-    @patch("utils.manager.mount", side_effect=nfs.Error("Failed to mount share"))
-    @patch("utils.manager.mounted", return_value=False)
-    def test_mount_share_failed(self, *_) -> None:
+    def test_mount_share_failed(self) -> None:
         """Test mount share handler when mount fails."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.mount_share.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, BlockedStatus("Failed to mount share"))
+        self.mock_mounted.return_value = False
+        self.mock_mount.side_effect = _ERR_MOUNT_FAIL
+        self.harness.charm._nfs_share.on.mount_share.emit(self.integration, self.app)
+        self._assert_blocked(_ERR_MOUNT_FAIL.message)
 
-    @patch("utils.manager.mounted", return_value=True)
-    def test_mount_share_already_mounted(self, _) -> None:
+    def test_mount_share_already_mounted(self) -> None:
         """Test mount share handler when NFS share is already mounted."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.mount_share.emit(integration, app)
+        self.mock_mounted.return_value = True
+        self.harness.charm._nfs_share.on.mount_share.emit(self.integration, self.app)
+        self.mock_mount.assert_not_called()
 
-    @patch("utils.manager.mount")
-    @patch("utils.manager.mounted", return_value=False)
-    def test_mount_share(self, *_) -> None:
+    def test_mount_share(self) -> None:
         """Test mount share handler."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.mount_share.emit(integration, app)
+        self.mock_mounted.return_value = False
+        self.harness.charm._stored.mountpoint = "/data"
+        self.harness.charm._stored.mntopts = {
+            "noexec": True,
+            "nosuid": False,
+            "nodev": True,
+            "read-only": False,
+        }
+        self.harness.charm._nfs_share.on.mount_share.emit(self.integration, self.app)
         self.assertIsInstance(self.harness.model.unit.status, ActiveStatus)
+        self.mock_mount.assert_called_once()
+        self.assertEqual(self.mock_mount.call_args.args[1], "/data")
+        self.assertEqual(
+            self.mock_mount.call_args.kwargs["options"], ["noexec", "suid", "nodev", "rw"]
+        )
 
-    @patch("utils.manager.umount", side_effect=nfs.Error("Failed to umount share"))
-    @patch("utils.manager.mounted")
-    def test_umount_share_failed(self, *_) -> None:
+    def test_umount_share_failed(self) -> None:
         """Test umount share handler when umount fails."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.umount_share.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, BlockedStatus("Failed to umount share"))
-
-    @patch("utils.manager.umount")
-    @patch(
-        "utils.manager.fetch",
-        return_value=nfs.MountInfo(
-            endpoint="127.0.0.1:/data",
-            mountpoint="/data",
-            fstype="nfs4",
-            options="some,thing",
-            freq="0",
-            passno="0",
-        ),
-    )
-    def test_umount_share_endpoint_provided_and_mounted(self, *_) -> None:
-        """Test umount share handler with endpoint and active mount."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.update_relation_data(
-            self.integration_id, "nfs-server-proxy", {"endpoint": "nfs://127.0.0.1/data"}
-        )
-        self.harness.charm._nfs_share.on.umount_share.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, WaitingStatus("Waiting for NFS share"))
-
-    @patch("utils.manager.fetch", return_value=None)
-    @patch("utils.manager.mount")
-    def test_umount_share_endpoint_provided_not_mounted(self, *_) -> None:
-        """Test umount share handler with endpoint and no mount."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.update_relation_data(
-            self.integration_id, "nfs-server-proxy", {"endpoint": "nfs://127.0.0.1/data"}
-        )
-        self.harness.charm._nfs_share.on.umount_share.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, WaitingStatus("Waiting for NFS share"))
-
-    @patch("utils.manager.umount")
-    @patch("utils.manager.mounted", return_value=True)
-    def test_umount_share_no_endpoint_and_mounted(self, *_) -> None:
-        """Test umount share handler with no endpoint and active mount."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.umount_share.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, WaitingStatus("Waiting for NFS share"))
-
-    @patch("utils.manager.mounted", return_value=False)
-    def test_umount_share_no_endpoint_not_mounted(self, _) -> None:
-        """Test umount share handler with no endpoint and no mount."""
-        integration = self.harness.charm.model.get_relation("nfs-share", self.integration_id)
-        app = self.harness.charm.model.get_app("nfs-server-proxy")
-        self.harness.charm._nfs_share.on.umount_share.emit(integration, app)
-        self.assertEqual(self.harness.model.unit.status, WaitingStatus("Waiting for NFS share"))
-
-    @patch("utils.manager.umount")
-    @patch("utils.manager.mounted", return_value=True)
-    def test_force_umount_mounted_and_equal(self, *_) -> None:
+        self.mock_mounted.return_value = True
+        self.mock_umount.side_effect = _ERR_UMOUNT_FAIL
+        self.harness.charm._nfs_share.on.umount_share.emit(self.integration, self.app)
+        self._assert_blocked(_ERR_UMOUNT_FAIL.message)
+
+    def test_umount_share_matrix(self) -> None:
+        """Test umount share handler with and without endpoint and active mount."""
+        cases = [
+            ("", True),
+            ("", False),
+            ("nfs://127.0.0.1/data", True),
+            ("nfs://127.0.0.1/data", False),
+        ]
+        for endpoint, mounted in cases:
+            with self.subTest(endpoint=endpoint, mounted=mounted):
+                self.mock_umount.reset_mock()
+                self.mock_mounted.return_value = mounted
+                self.mock_fetch.return_value = _DEFAULT_MOUNTINFO if mounted else None
+                self.harness.update_relation_data(
+                    self.integration_id, "nfs-server-proxy", {"endpoint": endpoint}
+                )
+                self.harness.charm._nfs_share.on.umount_share.emit(self.integration, self.app)
+                self.assertEqual(self.harness.model.unit.status, _STATUS_WAITING)
+                self.assertEqual(self.mock_umount.called, mounted)
+
+    def test_force_umount_mounted_and_equal(self) -> None:
         """Test force-umount action with share mounted and exact path name."""
+        self.mock_mounted.return_value = True
         # Patch charm stored state.
         self.harness.charm._stored.mountpoint = "/data"
-        event = MagicMock()
-        setattr(event, "params", {"mountpoint": "/data"})
+        event = _force_umount_event("/data")
         self.harness.charm._on_force_umount_action(event)
-        self.assertEqual(self.harness.model.unit.status, WaitingStatus("Waiting for NFS share"))
+        self.assertEqual(self.harness.model.unit.status, _STATUS_WAITING)
 
-    @patch("utils.manager.umount", side_effect=nfs.Error("Failed to umount share"))
-    @patch("utils.manager.mounted", return_value=True)
-    def test_force_umount_failed(self, *_) -> None:
+    def test_force_umount_failed(self) -> None:
         """Test force-umount action when it fails."""
+        self.mock_mounted.return_value = True
+        self.mock_umount.side_effect = _ERR_UMOUNT_FAIL
         # Patch charm stored state.
         self.harness.charm._stored.mountpoint = "/data"
-        event = MagicMock()
-        setattr(event, "params", {"mountpoint": "/data"})
+        event = _force_umount_event("/data")
         self.harness.charm._on_force_umount_action(event)
-        self.assertEqual(self.harness.charm.unit.status, BlockedStatus("Failed to umount share"))
+        self._assert_blocked(_ERR_UMOUNT_FAIL.message)
 
     def test_force_umount_bad_mountpoint(self) -> None:
         """Test force-umount action when passed mountpoint != internal mountpoint."""
         self.harness.charm._stored.mountpoint = "/data"
-        event = MagicMock()
-        setattr(event, "params", {"mountpoint": "/nuccitheboss"})
+        event = _force_umount_event("/nuccitheboss")
         self.harness.charm._on_force_umount_action(event)
+        event.fail.assert_called_once()
+        self.mock_umount.assert_not_called()
 
-    @patch("utils.manager.mounted", return_value=False)
-    def test_force_umount_not_mounted(self, _) -> None:
+    def test_force_umount_not_mounted(self) -> None:
         """Test force-umount action when mountpoint is not mounted."""
+        self.mock_mounted.return_value = False
         self.harness.charm._stored.mountpoint = "/data"
-        event = MagicMock()
-        setattr(event, "params", {"mountpoint": "/data"})
+        event = _force_umount_event("/data")
         self.harness.charm._on_force_umount_action(event)
+        event.fail.assert_called_once_with("/data is not mounted")
+        self.mock_umount.assert_not_called()